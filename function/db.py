@@ -1,10 +1,17 @@
+import hashlib
 import os
+import re
 import uuid
+from contextlib import contextmanager
 
 import psycopg2.pool
+from psycopg2 import errors, sql
 
 from utils import jsondumps
 
+# Knowledge shared across every workspace/channel lives in this namespace
+GLOBAL_NAMESPACE = 'global'
+
 # Allow initialization in a lazy way
 pool = psycopg2.pool.SimpleConnectionPool(
     1, 8,  # min and max connections
@@ -15,16 +22,90 @@ pool = psycopg2.pool.SimpleConnectionPool(
     database=os.getenv('DB_NAME'),
 )
 
+# Kept in sync with init_db.sql, as snapshot imports rebuild the index after loading
+EMBEDDING_INDEX_SQL = '''
+    CREATE INDEX IF NOT EXISTS idx_knowledgebase_namespace_embedding
+    ON knowledgebase USING hnsw (embedding vector_l2_ops)'''
+
+# Namespaces whose partition is known to exist, to skip the DDL on warm invocations
+_known_partitions: set[str] = set()
+
+
+def get_partition_name(namespace: str) -> str:
+    if namespace == GLOBAL_NAMESPACE:
+        # Created by init_db.sql
+        return 'knowledgebase_global'
+    # The slug is lossy, the hash of the raw namespace keeps the names unique
+    slug = re.sub(r'[^a-z0-9]+', '_', namespace.lower())
+    digest = hashlib.sha1(namespace.encode('utf-8')).hexdigest()[:8]
+    # PostgreSQL truncates identifiers longer than 63 bytes
+    return f'knowledgebase_{slug[:40]}_{digest}'
+
 
-def create_db_record(content, embedding):
+def ensure_namespace_partition(namespace: str, conn=None):
+    if namespace in _known_partitions:
+        return
+
+    own_conn = conn is None
+    if own_conn:
+        conn = pool.getconn()
+    cursor = conn.cursor()
+    try:
+        # Serialise concurrent invocations creating the same partition
+        cursor.execute('SELECT pg_advisory_xact_lock(hashtext(%s))', (namespace,))
+        # Any partition already covering the namespace counts, whatever its name
+        cursor.execute('''
+            SELECT EXISTS (
+                SELECT 1
+                FROM pg_inherits
+                JOIN pg_class ON pg_class.oid = pg_inherits.inhrelid
+                WHERE
+                    pg_inherits.inhparent = 'knowledgebase'::regclass
+                    AND pg_get_expr(pg_class.relpartbound, pg_class.oid)
+                        = 'FOR VALUES IN (' || quote_literal(%s) || ')'
+            )''', (namespace,))
+        if not cursor.fetchone()[0]:
+            partition = sql.Identifier(get_partition_name(namespace))
+            cursor.execute(
+                sql.SQL('CREATE TABLE {} (LIKE knowledgebase INCLUDING DEFAULTS)').format(partition)
+            )
+            # Unlike CREATE TABLE ... PARTITION OF, which takes an ACCESS EXCLUSIVE lock on
+            # knowledgebase, ATTACH PARTITION only takes a SHARE UPDATE EXCLUSIVE lock on it,
+            # so searches are not blocked. The embedding index cascades to the new partition.
+            cursor.execute(
+                sql.SQL('ALTER TABLE knowledgebase ATTACH PARTITION {} FOR VALUES IN ({})').format(
+                    partition,
+                    sql.Literal(namespace),
+                )
+            )
+        if own_conn:
+            conn.commit()
+    except (errors.DuplicateTable, errors.UniqueViolation):
+        # Another invocation created the partition first
+        if not own_conn:
+            raise
+        conn.rollback()
+    except:  # pylint: disable=bare-except
+        if own_conn:
+            conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        if own_conn:
+            pool.putconn(conn)
+    _known_partitions.add(namespace)
+
+
+def create_db_record(content, embedding, namespace=GLOBAL_NAMESPACE):
     id_ = str(uuid.uuid4())
+    ensure_namespace_partition(namespace)
     conn = pool.getconn()
     cursor = conn.cursor()
     try:
         cursor.execute('''
-            INSERT INTO knowledgebase (id, content, embedding)
-            VALUES (%s, %s, %s)''',
-            (id_, content, jsondumps(embedding))
+            INSERT INTO knowledgebase (id, namespace, content, embedding)
+            VALUES (%s, %s, %s, %s)''',
+            (id_, namespace, content, jsondumps(embedding))
         )
         conn.commit()
     finally:
@@ -33,18 +114,26 @@ def create_db_record(content, embedding):
     return id_
 
 
-def get_db_records_by_embedding(embedding, limit=5):
+def get_db_records_by_embedding(embedding, namespace=GLOBAL_NAMESPACE, include_global=False, limit=5):
+    namespaces = [namespace]
+    if include_global and namespace != GLOBAL_NAMESPACE:
+        namespaces.append(GLOBAL_NAMESPACE)
+
     conn = pool.getconn()
     cursor = conn.cursor()
     try:
+        # The namespaces are inlined as literals, so the planner prunes
+        # every other partition and only scans their embedding indexes
         cursor.execute('''
             SELECT
                 id,
+                namespace,
                 content,
                 embedding <-> %s AS distance
             FROM knowledgebase
+            WHERE namespace IN %s
             ORDER BY distance ASC
-            LIMIT %s''', (jsondumps(embedding), limit))
+            LIMIT %s''', (jsondumps(embedding), tuple(namespaces), limit))
         results = cursor.fetchall()
     finally:
         cursor.close()
@@ -53,7 +142,74 @@ def get_db_records_by_embedding(embedding, limit=5):
     return [
         {
             'id': result[0],
-            'content': result[1]
+            'namespace': result[1],
+            'content': result[2],
         }
         for result in results
     ]
+
+
+@contextmanager
+def export_db_records():
+    """Yields the row count and a function streaming the same consistent snapshot
+    of rows as binary COPY data into a file-like object."""
+    conn = pool.getconn()
+    conn.set_session(isolation_level='REPEATABLE READ', readonly=True)
+    cursor = conn.cursor()
+    try:
+        cursor.execute('SELECT count(*) FROM knowledgebase WHERE embedding IS NOT NULL')
+        total = cursor.fetchone()[0]
+
+        def copy_to(binary_file):
+            cursor.copy_expert('''
+                COPY (
+                    SELECT id, namespace, content, embedding
+                    FROM knowledgebase
+                    WHERE embedding IS NOT NULL
+                ) TO STDOUT WITH (FORMAT binary)''', binary_file)
+
+        yield total, copy_to
+    finally:
+        cursor.close()
+        conn.rollback()
+        conn.set_session(isolation_level='DEFAULT', readonly='DEFAULT')
+        pool.putconn(conn)
+
+
+def import_db_records(namespaces, binary_file, maintenance_work_mem='1GB', parallel_workers=4):
+    """Bulk loads binary COPY data of (id, namespace, content, embedding) in a single transaction."""
+    conn = pool.getconn()
+    cursor = conn.cursor()
+    try:
+        # Dropping the index locks knowledgebase until the rebuild is done, and the rebuild
+        # would cover any existing rows too, so imports are only meant for bootstrapping
+        cursor.execute('SELECT EXISTS (SELECT 1 FROM knowledgebase)')
+        if cursor.fetchone()[0]:
+            raise ValueError('Snapshots can only be imported into an empty knowledge base')
+        for namespace in namespaces:
+            ensure_namespace_partition(namespace, conn=conn)
+        # Building the index once after COPY is much faster than maintaining it per row
+        cursor.execute('DROP INDEX IF EXISTS idx_knowledgebase_namespace_embedding')
+        cursor.copy_expert(
+            'COPY knowledgebase (id, namespace, content, embedding) FROM STDIN WITH (FORMAT binary)',
+            binary_file,
+        )
+        # The HNSW build is far slower once its graph no longer fits in maintenance_work_mem
+        cursor.execute(
+            '''
+            SELECT
+                set_config('maintenance_work_mem', %s, true),
+                set_config('max_parallel_maintenance_workers', %s, true)''',
+            (maintenance_work_mem, str(parallel_workers)),
+        )
+        cursor.execute(EMBEDDING_INDEX_SQL)
+        conn.commit()
+        cursor.execute('ANALYZE knowledgebase')
+        conn.commit()
+    except:  # pylint: disable=bare-except
+        conn.rollback()
+        _known_partitions.difference_update(namespaces)
+        raise
+    finally:
+        cursor.close()
+        pool.putconn(conn)
@@ -0,0 +1,251 @@
+"""
+Export/import the knowledge base to/from a compact snapshot directory, to
+bootstrap a new environment without re-creating every embedding with Bedrock.
+
+A snapshot consists of:
+- records.jsonl - one JSON object per row with the id, namespace and content
+- embeddings.npy - the embeddings as a contiguous (rows, dimensions) array,
+  row N belonging to line N of records.jsonl, which can be memory-mapped
+
+Usage:
+    python knowledge_snapshot.py export <snapshot_dir> [--dtype float16]
+    python knowledge_snapshot.py import <snapshot_dir> [--maintenance-work-mem 1GB] [--parallel-workers 4]
+"""
+import argparse
+import json
+import logging
+import os
+import struct
+import uuid
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from db import export_db_records, import_db_records
+from utils import jsondumps, logger
+
+EMBEDDING_DIMENSIONS = 1024
+RECORDS_FILENAME = 'records.jsonl'
+EMBEDDINGS_FILENAME = 'embeddings.npy'
+# Rows encoded per chunk handed to COPY during imports
+IMPORT_BATCH_SIZE = 1000
+
+# PostgreSQL binary COPY format: signature, flags and header extension length
+COPY_SIGNATURE = b'PGCOPY\n\xff\r\n\x00'
+COPY_HEADER = COPY_SIGNATURE + struct.pack('!ii', 0, 0)
+COPY_TRAILER = struct.pack('!h', -1)
+# pgvector's binary format: dimensions, an unused int16, then big-endian float4 values
+VECTOR_HEADER = struct.pack('!hh', EMBEDDING_DIMENSIONS, 0)
+VECTOR_FIELD_HEADER = struct.pack('!i', len(VECTOR_HEADER) + 4 * EMBEDDING_DIMENSIONS)
+
+
+class _ChunkReader:
+    """Minimal file-like object over an iterator of byte chunks, so COPY can stream it."""
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self._buffer = b''
+        self._offset = 0
+
+    def read(self, size=-1):
+        while self._offset >= len(self._buffer):
+            try:
+                self._buffer = next(self._chunks)
+            except StopIteration:
+                return b''
+            self._offset = 0
+        end = len(self._buffer) if size < 0 else min(self._offset + size, len(self._buffer))
+        data = self._buffer[self._offset:end]
+        self._offset = end
+        return data
+
+
+class _BinaryCopyWriter:
+    """Minimal file-like object parsing binary COPY data into rows as it is written."""
+
+    def __init__(self, on_row):
+        self._on_row = on_row
+        self._buffer = bytearray()
+        self._header_read = False
+
+    def write(self, data):
+        self._buffer += data
+        pos = 0
+        if not self._header_read:
+            if len(self._buffer) < len(COPY_HEADER):
+                return
+            if not self._buffer.startswith(COPY_SIGNATURE):
+                raise ValueError('Invalid binary COPY signature')
+            extension_length = struct.unpack_from('!i', self._buffer, len(COPY_SIGNATURE) + 4)[0]
+            pos = len(COPY_HEADER) + extension_length
+            self._header_read = True
+        while True:
+            fields, end = self._parse_row(pos)
+            if end == pos:
+                break
+            if fields is not None:
+                self._on_row(fields)
+            pos = end
+        del self._buffer[:pos]
+
+    def _parse_row(self, pos):
+        """Returns the fields of the row at pos and the position after it, which is
+        unchanged when the row is not complete yet."""
+        buffer = self._buffer
+        if len(buffer) - pos < 2:
+            return None, pos
+        field_count = struct.unpack_from('!h', buffer, pos)[0]
+        if field_count == -1:
+            # Trailer
+            return None, pos + 2
+        end = pos + 2
+        fields = []
+        for _ in range(field_count):
+            if len(buffer) - end < 4:
+                return None, pos
+            length = struct.unpack_from('!i', buffer, end)[0]
+            end += 4
+            if length == -1:
+                fields.append(None)
+                continue
+            if len(buffer) - end < length:
+                return None, pos
+            fields.append(bytes(buffer[end:end + length]))
+            end += length
+        return fields, end
+
+
+def _encode_text_field(value: str) -> bytes:
+    data = value.encode('utf-8')
+    return struct.pack('!i', len(data)) + data
+
+
+def export_snapshot(snapshot_dir: str, dtype: str = 'float32') -> int:
+    os.makedirs(snapshot_dir, exist_ok=True)
+    count = 0
+
+    with export_db_records() as (total, copy_to):
+        # The embeddings are written straight into the memory-mapped file row by row
+        embeddings = open_memmap(
+            os.path.join(snapshot_dir, EMBEDDINGS_FILENAME),
+            mode='w+',
+            dtype=dtype,
+            shape=(total, EMBEDDING_DIMENSIONS),
+        )
+        with open(os.path.join(snapshot_dir, RECORDS_FILENAME), 'w', encoding='utf-8') as records_file:
+            def write_row(fields):
+                nonlocal count
+                id_, namespace, content, embedding = fields
+                records_file.write(jsondumps({
+                    'id': str(uuid.UUID(bytes=id_)),
+                    'namespace': namespace.decode('utf-8'),
+                    'content': content.decode('utf-8') if content is not None else None,
+                }) + '\n')
+                if embedding[:len(VECTOR_HEADER)] != VECTOR_HEADER:
+                    raise ValueError(f'Unexpected embedding dimensions for record {uuid.UUID(bytes=id_)}')
+                embeddings[count] = np.frombuffer(embedding, dtype='>f4', offset=len(VECTOR_HEADER))
+                count += 1
+
+            copy_to(_BinaryCopyWriter(write_row))
+        embeddings.flush()
+        del embeddings
+
+    logger.info(f'Exported {count} knowledge base records to {snapshot_dir}')
+    return count
+
+
+def _iter_records(snapshot_dir: str):
+    with open(os.path.join(snapshot_dir, RECORDS_FILENAME), encoding='utf-8') as records_file:
+        for line in records_file:
+            yield json.loads(line)
+
+
+def _iter_copy_chunks(snapshot_dir: str, embeddings):
+    yield COPY_HEADER
+    records = _iter_records(snapshot_dir)
+    for start in range(0, embeddings.shape[0], IMPORT_BATCH_SIZE):
+        # Converted to big-endian float4 a batch at a time rather than per value
+        batch = np.asarray(embeddings[start:start + IMPORT_BATCH_SIZE], dtype='>f4')
+        parts = []
+        for embedding in batch:
+            record = next(records)
+            content = record['content']
+            parts.append(struct.pack('!hi', 4, 16))
+            parts.append(uuid.UUID(record['id']).bytes)
+            parts.append(_encode_text_field(record['namespace']))
+            parts.append(_encode_text_field(content) if content is not None else struct.pack('!i', -1))
+            parts.append(VECTOR_FIELD_HEADER)
+            parts.append(VECTOR_HEADER)
+            parts.append(embedding.tobytes())
+        yield b''.join(parts)
+    yield COPY_TRAILER
+
+
+def import_snapshot(snapshot_dir: str, maintenance_work_mem: str = '1GB', parallel_workers: int = 4) -> int:
+    embeddings = np.load(os.path.join(snapshot_dir, EMBEDDINGS_FILENAME), mmap_mode='r')
+    if embeddings.ndim != 2 or embeddings.shape[1] != EMBEDDING_DIMENSIONS:
+        raise ValueError(f'Snapshot {snapshot_dir} has embeddings of shape {embeddings.shape}')
+
+    # First pass to create the namespace partitions before loading any rows into them
+    namespaces = set()
+    count = 0
+    for record in _iter_records(snapshot_dir):
+        namespaces.add(record['namespace'])
+        count += 1
+    if count != embeddings.shape[0]:
+        raise ValueError(
+            f'Snapshot {snapshot_dir} has {count} records but {embeddings.shape[0]} embeddings'
+        )
+
+    import_db_records(
+        namespaces,
+        _ChunkReader(_iter_copy_chunks(snapshot_dir, embeddings)),
+        maintenance_work_mem=maintenance_work_mem,
+        parallel_workers=parallel_workers,
+    )
+
+    logger.info(f'Imported {count} knowledge base records from {snapshot_dir}')
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export/import knowledge base snapshots.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = subparsers.add_parser('export', help='Export the knowledge base to a snapshot.')
+    export_parser.add_argument('snapshot_dir')
+    export_parser.add_argument(
+        '--dtype',
+        choices=['float32', 'float16'],
+        default='float32',
+        help='Embedding precision, float16 halves the snapshot size.',
+    )
+
+    import_parser = subparsers.add_parser('import', help='Import a snapshot into the knowledge base.')
+    import_parser.add_argument('snapshot_dir')
+    import_parser.add_argument(
+        '--maintenance-work-mem',
+        default='1GB',
+        help='maintenance_work_mem for the vector index build, ideally larger than the index.',
+    )
+    import_parser.add_argument(
+        '--parallel-workers',
+        type=int,
+        default=4,
+        help='max_parallel_maintenance_workers for the vector index build.',
+    )
+
+    args = parser.parse_args()
+    if args.command == 'export':
+        export_snapshot(args.snapshot_dir, dtype=args.dtype)
+    else:
+        import_snapshot(
+            args.snapshot_dir,
+            maintenance_work_mem=args.maintenance_work_mem,
+            parallel_workers=args.parallel_workers,
+        )
+
+
+if __name__ == '__main__':
+    logger.addHandler(logging.StreamHandler())
+    main()
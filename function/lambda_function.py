@@ -5,9 +5,10 @@ from slack_bolt.adapter.aws_lambda import SlackRequestHandler
 
 from slack_utils import (
     slack_app,
+    get_knowledge_namespace,
     load_slack_conversations,
 )
-from tools import TOOL_MAPPING
+from tools import NAMESPACED_TOOLS, TOOL_MAPPING
 from utils import jsondumps, logger
 
 if TYPE_CHECKING:
@@ -22,7 +23,7 @@ MAX_TOOL_CALL_LOOPS = 10
 
 
 @slack_app.event('message')
-def handle_keywords(event: dict, say):
+def handle_keywords(event: dict, say, context: dict):
     channel = event['channel']
     ts = event['ts']
     thread_ts = event.get('thread_ts')
@@ -42,6 +43,7 @@ def handle_keywords(event: dict, say):
     )
 
     try:
+        namespace = get_knowledge_namespace(context.get('team_id'), channel)
         converse_message = construct_converse_messages(conversations)
         converse_messages = [converse_message]
 
@@ -70,7 +72,10 @@ def handle_keywords(event: dict, say):
                             thread_ts=reply_ts,
                         )
                         try:
-                            tool_result_content_block = tool_func(**tool_input)
+                            if tool_name in NAMESPACED_TOOLS:
+                                tool_result_content_block = tool_func(**tool_input, namespace=namespace)
+                            else:
+                                tool_result_content_block = tool_func(**tool_input)
                             if tool_name != 'retreive_url':
                                 logger.info(f'Tool {tool_name} result: {tool_result_content_block}')
                             else:
@@ -2,7 +2,7 @@ import json
 
 import boto3
 
-from db import create_db_record, get_db_records_by_embedding
+from db import GLOBAL_NAMESPACE, create_db_record, get_db_records_by_embedding
 
 EMBEDDING_MODEL_ID = 'amazon.titan-embed-text-v2:0'
 
@@ -28,13 +28,17 @@ def create_embedding(input_text: str):
     return response_body['embedding']
 
 
-def create_knowledge_db_record(content: str) -> str:
+def create_knowledge_db_record(content: str, namespace: str = GLOBAL_NAMESPACE) -> str:
     embedding = create_embedding(content)
-    result_id = create_db_record(content, embedding)
+    result_id = create_db_record(content, embedding, namespace=namespace)
     return result_id
 
 
-def search_knowledge_db_record(question: str) -> list:
+def search_knowledge_db_record(
+    question: str,
+    namespace: str = GLOBAL_NAMESPACE,
+    include_global: bool = False,
+) -> list:
     embedding = create_embedding(question)
-    results = get_db_records_by_embedding(embedding)
+    results = get_db_records_by_embedding(embedding, namespace=namespace, include_global=include_global)
     return results
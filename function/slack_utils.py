@@ -5,6 +5,8 @@ from slack_bolt import App
 
 SLACK_BOT_TOKEN = os.getenv('SLACK_BOT_TOKEN')
 SLACK_SIGNING_SECRET = os.getenv('SLACK_SIGNING_SECRET')
+# Either "team" (one knowledge namespace per workspace) or "channel"
+KNOWLEDGE_NAMESPACE_SCOPE = os.getenv('KNOWLEDGE_NAMESPACE_SCOPE', 'team')
 
 http = urllib3.PoolManager()
 
@@ -37,6 +39,18 @@ def get_attachments(message: dict) -> list:
     return attachment_info
 
 
+def get_knowledge_namespace(team_id: str | None, channel: str) -> str:
+    # The team of the workspace the bot is installed in, not of the message author,
+    # so that external users in Slack Connect channels share the host's namespace
+    if not team_id:
+        raise ValueError('Unable to determine the Slack workspace of the event')
+    if KNOWLEDGE_NAMESPACE_SCOPE == 'channel':
+        return f'{team_id}:{channel}'
+    if KNOWLEDGE_NAMESPACE_SCOPE == 'team':
+        return team_id
+    raise ValueError(f'Unknown KNOWLEDGE_NAMESPACE_SCOPE: {KNOWLEDGE_NAMESPACE_SCOPE}')
+
+
 def load_slack_conversations(channel: str, thread_ts: str) -> list:
     conversation = slack_app.client.conversations_replies(
         channel=channel,
@@ -1,9 +1,11 @@
+import os
 from typing import TYPE_CHECKING
 
 import urllib3
 from duckduckgo_search import DDGS
 from fake_useragent import UserAgent
 
+from db import GLOBAL_NAMESPACE
 from rag_utils import (
     create_knowledge_db_record,
     search_knowledge_db_record,
@@ -23,6 +25,9 @@ http = urllib3.PoolManager()
 ua = UserAgent()
 ddgs = DDGS()
 
+# Whether knowledge base searches also cover the shared global namespace
+SEARCH_GLOBAL_NAMESPACE = os.getenv('KNOWLEDGE_SEARCH_GLOBAL', 'true').lower() == 'true'
+
 
 def search_web(*, query: str) -> 'ToolResultContentBlockOutputTypeDef':
     results = ddgs.text(query, max_results=10)
@@ -89,8 +94,12 @@ def retreive_url(*, url: str) -> 'ToolResultContentBlockOutputTypeDef':
         }
 
 
-def snapshot_knowledge(*, content: str) -> 'ToolResultContentBlockOutputTypeDef':
-    knowledge_id = create_knowledge_db_record(content)
+def snapshot_knowledge(
+    *,
+    content: str,
+    namespace: str = GLOBAL_NAMESPACE,
+) -> 'ToolResultContentBlockOutputTypeDef':
+    knowledge_id = create_knowledge_db_record(content, namespace=namespace)
     return {
         'json': {
             'knowledge_id': knowledge_id,
@@ -98,8 +107,16 @@ def snapshot_knowledge(*, content: str) -> 'ToolResultContentBlockOutputTypeDef'
     }
 
 
-def search_knowledge_base(*, question: str) -> 'ToolResultContentBlockOutputTypeDef':
-    records = search_knowledge_db_record(question)
+def search_knowledge_base(
+    *,
+    question: str,
+    namespace: str = GLOBAL_NAMESPACE,
+) -> 'ToolResultContentBlockOutputTypeDef':
+    records = search_knowledge_db_record(
+        question,
+        namespace=namespace,
+        include_global=SEARCH_GLOBAL_NAMESPACE,
+    )
     return {
         'json': {
             'records': records,
@@ -180,3 +197,10 @@ TOOL_MAPPING = {
     'snapshot_knowledge': snapshot_knowledge,
     'search_knowledge_base': search_knowledge_base,
 }
+
+# Tools scoped to the Slack workspace/channel, the namespace is injected by the
+# handler and never taken from the LLM's tool input
+NAMESPACED_TOOLS = {
+    'snapshot_knowledge',
+    'search_knowledge_base',
+}
@@ -1,10 +1,18 @@
 CREATE EXTENSION IF NOT EXISTS pgcrypto;
 CREATE EXTENSION IF NOT EXISTS vector;
 
+-- List-partitioned by namespace (Slack workspace or channel), so that searches
+-- only scan the partition of the namespace being queried.
+-- Partitions other than "global" are created on demand by the Lambda function.
 CREATE TABLE IF NOT EXISTS knowledgebase (
-    id UUID PRIMARY KEY,
+    id UUID NOT NULL,
+    namespace TEXT NOT NULL,
     content TEXT,
-    embedding VECTOR(1024)
-);
+    embedding VECTOR(1024),
+    PRIMARY KEY (namespace, id)
+) PARTITION BY LIST (namespace);
 
-CREATE INDEX idx_knowledgebase_embedding ON knowledgebase USING ivfflat (embedding vector_l2_ops) WITH (lists = 16);
+CREATE TABLE IF NOT EXISTS knowledgebase_global PARTITION OF knowledgebase FOR VALUES IN ('global');
+
+-- HNSW instead of IVFFlat, as partitions start empty and IVFFlat lists are only trained at build time
+CREATE INDEX IF NOT EXISTS idx_knowledgebase_namespace_embedding ON knowledgebase USING hnsw (embedding vector_l2_ops);